@@ -0,0 +1,339 @@
+# Cache de resultados compartida entre réplicas del dashboard.
+# st.cache_data vive dentro de un proceso; esta cache guarda datasets, agregados y figuras
+# serializadas en un backend común (SQLite en disco o un servidor con protocolo Redis),
+# así un cálculo hecho por una réplica lo reutilizan todas las demás.
+import hashlib
+import json
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorRedis(Exception):
+    pass
+
+
+class BackendSQLite:
+    # Backend en disco, solo para réplicas en la misma máquina: el modo WAL de SQLite usa
+    # memoria compartida del host y no funciona sobre un sistema de archivos de red. Para
+    # réplicas en varias máquinas hay que usar BackendRedis.
+    # Las entradas vencen por TTL y, si se pasa de max_bytes, se borran las menos usadas.
+
+    # Cada cuántos segundos como mínimo se actualiza la fecha de uso de una entrada al leerla,
+    # para que la mayoría de las lecturas no escriban en la base
+    intervalo_uso = 60
+
+    def __init__(self, ruta, max_bytes=512 * 1024 * 1024):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        con = self._conexion()
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("""CREATE TABLE IF NOT EXISTS entradas (
+            clave TEXT PRIMARY KEY, valor BLOB, expira REAL, usado REAL, tamano INTEGER)""")
+
+    def _conexion(self):
+        # sqlite3 no permite compartir una conexión entre hilos, abro una por hilo
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+            self._local.con = con
+        return con
+
+    def get(self, clave):
+        con = self._conexion()
+        ahora = time.time()
+        fila = con.execute("SELECT valor, expira, usado FROM entradas WHERE clave = ?", (clave,)).fetchone()
+        if fila is None:
+            return None
+        valor, expira, usado = fila
+        if expira <= ahora:
+            con.execute("DELETE FROM entradas WHERE clave = ? AND expira <= ?", (clave, ahora))
+            return None
+        if ahora - usado >= self.intervalo_uso:
+            con.execute("UPDATE entradas SET usado = ? WHERE clave = ?", (ahora, clave))
+        return valor
+
+    def set(self, clave, valor, ttl):
+        con = self._conexion()
+        ahora = time.time()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?)",
+                        (clave, valor, ahora + ttl, ahora, len(valor)))
+            con.execute("DELETE FROM entradas WHERE expira <= ?", (ahora,))
+            # Conservo las entradas usadas más recientemente hasta llenar max_bytes y borro el resto
+            con.execute("""DELETE FROM entradas WHERE clave IN (
+                SELECT clave FROM (SELECT clave, SUM(tamano) OVER (ORDER BY usado DESC, clave) AS acumulado FROM entradas)
+                WHERE acumulado > ?)""", (self.max_bytes,))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def add(self, clave, valor, ttl):
+        # Guarda solo si la clave no existe o ya venció. Devuelve True si la guardó.
+        con = self._conexion()
+        ahora = time.time()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("DELETE FROM entradas WHERE clave = ? AND expira <= ?", (clave, ahora))
+            cursor = con.execute("INSERT OR IGNORE INTO entradas VALUES (?, ?, ?, ?, ?)",
+                                 (clave, valor, ahora + ttl, ahora, len(valor)))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, clave):
+        self._conexion().execute("DELETE FROM entradas WHERE clave = ?", (clave,))
+
+    def delete_if_equals(self, clave, valor):
+        # Borra la clave solo si todavía guarda ese valor (el token de quien tomó el bloqueo)
+        self._conexion().execute("DELETE FROM entradas WHERE clave = ? AND valor = ?", (clave, valor))
+
+
+script_borrar_si_igual = "if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) else return 0 end"
+
+
+class BackendRedis:
+    # Backend para cualquier servidor que hable el protocolo de Redis (RESP). Implemento
+    # solo los comandos que uso para no agregar dependencias. El TTL lo maneja el servidor
+    # y el límite de tamaño se configura en él (maxmemory con allkeys-lru).
+
+    def __init__(self, url='redis://localhost:6379/0', timeout=5):
+        partes = urlparse(url)
+        self.host = partes.hostname or 'localhost'
+        self.port = partes.port or 6379
+        self.password = partes.password
+        self.db = int(partes.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conectar(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.archivo = sock.makefile('rb')
+        try:
+            if self.password:
+                self._enviar('AUTH', self.password)
+            if self.db:
+                self._enviar('SELECT', self.db)
+        except BaseException:
+            # Si falla AUTH o SELECT la conexión no sirve: la descarto para no usarla sin autenticar o en otra db
+            sock.close()
+            self._local.sock = None
+            raise
+
+    def _enviar(self, *args):
+        partes = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            partes.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        self._local.sock.sendall(b''.join(partes))
+        return self._leer_respuesta()
+
+    def _leer_respuesta(self):
+        linea = self._local.archivo.readline()
+        if not linea.endswith(b'\r\n'):
+            raise ConnectionError("Conexión con Redis cerrada")
+        tipo, resto = linea[:1], linea[1:-2]
+        if tipo == b'+':
+            return resto.decode()
+        if tipo == b'-':
+            raise ErrorRedis(resto.decode())
+        if tipo == b':':
+            return int(resto)
+        if tipo == b'$':
+            largo = int(resto)
+            if largo == -1:
+                return None
+            return self._local.archivo.read(largo + 2)[:-2]
+        if tipo == b'*':
+            largo = int(resto)
+            if largo == -1:
+                return None
+            return [self._leer_respuesta() for _ in range(largo)]
+        raise ErrorRedis(f"Respuesta de Redis no reconocida: {linea!r}")
+
+    def _comando(self, *args, reintentar=True):
+        # Una conexión por hilo; si se cayó, reconecto y, si el comando es idempotente, lo repito una vez
+        if getattr(self._local, 'sock', None) is None:
+            self._conectar()
+        try:
+            return self._enviar(*args)
+        except OSError:
+            self._local.sock.close()
+            self._local.sock = None
+            if not reintentar:
+                raise
+            self._conectar()
+            return self._enviar(*args)
+
+    def get(self, clave):
+        return self._comando('GET', clave)
+
+    def set(self, clave, valor, ttl):
+        self._comando('SET', clave, valor, 'PX', int(ttl * 1000))
+
+    def add(self, clave, valor, ttl):
+        try:
+            return self._comando('SET', clave, valor, 'NX', 'PX', int(ttl * 1000), reintentar=False) == 'OK'
+        except OSError:
+            # Se perdió la respuesta, pero el SET pudo haber llegado al servidor. Reintento y,
+            # si la clave ya existe con nuestro valor, fue el primer intento el que la guardó.
+            if self._comando('SET', clave, valor, 'NX', 'PX', int(ttl * 1000)) == 'OK':
+                return True
+            return self._comando('GET', clave) == valor
+
+    def delete(self, clave):
+        self._comando('DEL', clave)
+
+    def delete_if_equals(self, clave, valor):
+        # Comparar y borrar tiene que ser atómico en el servidor, por eso va en un script Lua
+        self._comando('EVAL', script_borrar_si_igual, 1, clave, valor)
+
+
+def backend_desde_entorno():
+    # DASHBOARD_CACHE_URL elige el backend: redis://host:puerto/db, sqlite:///ruta/archivo.sqlite
+    # o "none" para desactivar la cache compartida. Por defecto uso SQLite en .cache/
+    url = os.environ.get('DASHBOARD_CACHE_URL', 'sqlite:///.cache/resultados.sqlite')
+    if url == 'none':
+        return None
+    if url.startswith('redis://'):
+        return BackendRedis(url)
+    if url.startswith('sqlite:///'):
+        max_bytes = int(os.environ.get('DASHBOARD_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+        try:
+            return BackendSQLite(url[len('sqlite:///'):], max_bytes=max_bytes)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("No se pudo abrir la cache en disco, se sigue sin cache compartida: %s", e)
+            return None
+    raise ValueError(f"DASHBOARD_CACHE_URL no soportada: {url}")
+
+
+_hashes_archivos = {}
+
+
+def hash_archivo(ruta):
+    # Hash del contenido del archivo, recalculado solo si cambia su fecha de modificación o tamaño
+    estado = os.stat(ruta)
+    firma = (ruta, estado.st_mtime_ns, estado.st_size)
+    if firma not in _hashes_archivos:
+        digest = hashlib.sha256()
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+                digest.update(bloque)
+        _hashes_archivos[firma] = digest.hexdigest()
+    return _hashes_archivos[firma]
+
+
+def clave_contenido(hash_datos, version_codigo, funcion, **parametros):
+    # Clave direccionada por contenido: mismo dataset, mismo código, función y filtros dan la
+    # misma clave en todas las réplicas. La versión del código evita que tras un despliegue se
+    # lean resultados calculados con el código anterior.
+    especificacion = json.dumps({'datos': hash_datos, 'codigo': version_codigo, 'funcion': funcion, 'parametros': parametros},
+                                sort_keys=True, default=str)
+    return 'dashboard:' + hashlib.sha256(especificacion.encode()).hexdigest()
+
+
+_ausente = object()
+
+
+class CacheResultados:
+    # Evita la estampida: cuando falta un resultado solo la réplica que toma el bloqueo lo
+    # calcula, las demás esperan a que aparezca en el backend. Si el backend falla se calcula
+    # directamente para que el dashboard siga funcionando.
+    # Por defecto los resultados se guardan con pickle, así que el backend tiene que ser de
+    # confianza: quien pueda escribir en él puede ejecutar código en las réplicas.
+
+    def __init__(self, backend, ttl=24 * 3600, ttl_bloqueo=300, intervalo_espera=0.2):
+        self.backend = backend
+        self.ttl = ttl
+        self.ttl_bloqueo = ttl_bloqueo
+        self.intervalo_espera = intervalo_espera
+        # Un bloqueo local por clave con contador de usuarios: se borra cuando nadie lo usa, así no
+        # se acumulan, y claves distintas nunca se bloquean entre sí mientras se calculan o esperan
+        self._bloqueos = {}
+        self._bloqueo_local = threading.Lock()
+
+    @contextmanager
+    def _bloqueo_clave(self, clave):
+        with self._bloqueo_local:
+            entrada = self._bloqueos.setdefault(clave, [threading.Lock(), 0])
+            entrada[1] += 1
+        try:
+            with entrada[0]:
+                yield
+        finally:
+            with self._bloqueo_local:
+                entrada[1] -= 1
+                if entrada[1] == 0:
+                    del self._bloqueos[clave]
+
+    def _backend(self, operacion, *args):
+        # Las fallas del backend no deben tumbar el dashboard: se registran y se sigue sin cache
+        try:
+            return getattr(self.backend, operacion)(*args)
+        except (OSError, sqlite3.Error, ErrorRedis) as e:
+            logger.warning("Cache compartida no disponible (%s): %s", operacion, e)
+            return None
+
+    def _leer(self, clave, deserializar):
+        # Una entrada que no se puede deserializar (corrupta o guardada con otra versión de las
+        # librerías) cuenta como ausente: la borro para que se vuelva a calcular
+        valor = self._backend('get', clave)
+        if valor is None:
+            return _ausente
+        try:
+            return deserializar(valor)
+        except Exception:
+            logger.warning("Entrada de la cache compartida inválida, se descarta: %s", clave, exc_info=True)
+            self._backend('delete', clave)
+            return _ausente
+
+    def obtener(self, clave, calcular, serializar=pickle.dumps, deserializar=pickle.loads):
+        if self.backend is None:
+            return calcular()
+        resultado = self._leer(clave, deserializar)
+        if resultado is not _ausente:
+            return resultado
+        # Dentro del proceso un solo hilo por clave va al backend
+        with self._bloqueo_clave(clave):
+            resultado = self._leer(clave, deserializar)
+            if resultado is not _ausente:
+                return resultado
+            clave_bloqueo = clave + ':bloqueo'
+            token = uuid.uuid4().hex.encode()
+            if self._backend('add', clave_bloqueo, token, self.ttl_bloqueo):
+                try:
+                    resultado = calcular()
+                    self._backend('set', clave, serializar(resultado), self.ttl)
+                    return resultado
+                finally:
+                    # Si el cálculo duró más que el bloqueo otra réplica pudo tomarlo: solo borro el mío
+                    self._backend('delete_if_equals', clave_bloqueo, token)
+            # Otra réplica lo está calculando: espero hasta que termine o venza su bloqueo
+            limite = time.monotonic() + self.ttl_bloqueo
+            while time.monotonic() < limite:
+                resultado = self._leer(clave, deserializar)
+                if resultado is not _ausente:
+                    return resultado
+                if self._backend('get', clave_bloqueo) is None:
+                    break
+                time.sleep(self.intervalo_espera)
+            return calcular()
@@ -1,18 +1,76 @@
+# Tomo el tiempo desde el inicio del script para reportar el tiempo hasta el primer render
+import time
+inicio_render = time.perf_counter()
+
+import logging
+import threading
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+
+# Solo usa la librería estándar, así que es barato importarlo al inicio
+from cache_compartido import CacheResultados, backend_desde_entorno, clave_contenido, hash_archivo
+
+logger = logging.getLogger(__name__)
 
 st.set_page_config(
     page_title="Dashboard IA Global",
     page_icon="icon.png"
 )
 
-# Agrego Cache para que mantenga los datos en memoria.
-# Defino funcion para cargar y limpiar los datos
-@st.cache_data
+# Diccionarios de categorías del set de datos. Los uso tanto en la limpieza como
+# para armar las opciones del Sidebar sin tener que cargar el dataframe.
+experience_map = {"SE": "Expert", "MI": "Intermediate", "EN": "Junior", "EX": "Director"}
+employment_map = {"PT": "Part-time", "FT": "Full-time", "CT": "Contract", "FL": "Freelance"}
+size_map = {"S": "Small", "M": "Medium", "L": "Large"}
+remote_map = {0: 'No remote', 50: 'Hybrid', 100: 'Fully remote'}
+education_levels = ['Associate', 'Bachelor', 'Master', 'PhD']
+industries = ['Automotive', 'Consulting', 'Education', 'Energy', 'Finance', 'Gaming', 'Government', 'Healthcare',
+              'Manufacturing', 'Media', 'Real Estate', 'Retail', 'Technology', 'Telecommunications', 'Transportation']
+countries = ['Australia', 'Austria', 'Canada', 'China', 'Denmark', 'Finland', 'France', 'Germany', 'India', 'Ireland',
+             'Israel', 'Japan', 'Netherlands', 'Norway', 'Singapore', 'South Korea', 'Sweden', 'Switzerland',
+             'United Kingdom', 'United States']
+
+archivo_datos = "diversified_job_postings_version0.csv"
+
+# Cache compartida entre réplicas (ver cache_compartido.py), una sola instancia por proceso.
+# El backend se elige con la variable de entorno DASHBOARD_CACHE_URL.
+@st.cache_resource(show_spinner=False)
+def cache_compartida():
+    return CacheResultados(backend_desde_entorno())
+
+# Clave de un resultado en la cache compartida: hash del dataset, hash de este script (la
+# versión del código que calcula los resultados), nombre del cálculo y sus parámetros (por ejemplo los filtros)
+def clave_resultado(nombre, parametros=None):
+    return clave_contenido(hash_archivo(archivo_datos), hash_archivo(__file__), nombre, **(parametros or {}))
+
+# Busco el resultado en la cache compartida; si no está, lo calculo y lo guardo
+def resultado_compartido(nombre, calcular, parametros=None, **serializacion):
+    return cache_compartida().obtener(clave_resultado(nombre, parametros), calcular, **serializacion)
+
+# Las figuras se guardan como JSON de plotly para que cualquier réplica las pueda reconstruir.
+# Delante va una cache en memoria, como con load_data, para no leer y reconstruir la figura
+# desde el backend en cada rerun. La clave ya identifica el resultado, por eso el cálculo no se hashea.
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def figura_en_memoria(clave, _calcular):
+    import plotly.io as pio
+    return cache_compartida().obtener(clave, _calcular,
+                                      serializar=lambda fig: fig.to_json().encode(),
+                                      deserializar=lambda datos: pio.from_json(datos.decode()))
+
+def figura_compartida(nombre, calcular, parametros=None):
+    return figura_en_memoria(clave_resultado(nombre, parametros), calcular)
+
+# Agrego Cache para que mantenga los datos en memoria. Por debajo uso la cache compartida
+# para que el dataset limpio se procese una sola vez entre todas las réplicas.
+# Sin spinner porque también la llama el hilo de precalentamiento, que no tiene sesión.
+@st.cache_data(show_spinner=False)
 def load_data():
-    df = pd.read_csv("diversified_job_postings_version0.csv")
+    return resultado_compartido('load_data', limpiar_datos)
+
+# Defino funcion para cargar y limpiar los datos
+def limpiar_datos():
+    # pandas se importa aquí para no pagar su costo en la página de Inicio
+    import pandas as pd
+    df = pd.read_csv(archivo_datos)
     # Limpieza y transformación
     df = df.drop('job_description_length', axis=1, errors='ignore')
     df['posting_date'] = pd.to_datetime(df['posting_date'], errors='coerce')
@@ -21,24 +79,60 @@ def load_data():
     df['application_duration_days'] = (df['application_deadline'] - df['posting_date']).dt.days
     df['required_skills'] = df['required_skills'].fillna('').apply(lambda x: [s.strip() for s in x.split(',') if s.strip()])
    
-    experience_map = {"SE": "Expert", "MI": "Intermediate", "EN": "Junior", "EX": "Director"}
     df['experience_level'] = df['experience_level'].astype(str).str.strip().replace(experience_map).astype('category')
     
-    employment_map = {"PT": "Part-time", "FT": "Full-time", "CT": "Contract", "FL": "Freelance"}
     df['employment_type'] = df['employment_type'].astype(str).str.strip().replace(employment_map).astype('category')
     
-    size_map = {"S": "Small", "M": "Medium", "L": "Large"}
     df['company_size'] = df['company_size'].astype(str).str.strip().replace(size_map).astype('category')
     
-    remote_map = {0: 'No remote', 50: 'Hybrid', 100: 'Fully remote'}
     df['remote_ratio'] = df['remote_ratio'].replace(remote_map).astype('category')
     
     cat_cols = ['job_title', 'experience_level', 'employment_type', 'company_location', 'company_size', 'employee_residence', 'remote_ratio', 'education_required', 'industry']
     df[cat_cols] = df[cat_cols].astype('category')
     return df
 
-#Cargo el dataframe con los datos
-df = load_data()
+# Precalentamiento en segundo plano: después del primer render importo las librerías
+# pesadas y lleno la cache de datos, así la primera visita a una sección no espera por ellas.
+# El hilo no tiene sesión, por eso las funciones con cache que llama van sin spinner.
+max_intentos_precalentamiento = 3
+
+# Estado compartido por todas las sesiones del proceso, para lanzar el hilo una sola vez
+# y limitar los reintentos si falla
+@st.cache_resource(show_spinner=False)
+def estado_precalentamiento():
+    return {'bloqueo': threading.Lock(), 'lanzado': False, 'intentos': 0, 'proximo_intento': 0.0}
+
+def precalentar(construir_indices, estado):
+    try:
+        import plotly.express  # noqa: F401
+        construir_indices(load_data())
+    except Exception:
+        # Registro el error y dejo reintentar más tarde, esperando el doble en cada intento
+        logger.exception("Falló el precalentamiento de la cache (intento %d de %d)",
+                         estado['intentos'], max_intentos_precalentamiento)
+        with estado['bloqueo']:
+            estado['lanzado'] = False
+            estado['proximo_intento'] = time.monotonic() + 30 * 2 ** estado['intentos']
+        return
+    try:
+        import sklearn.cluster  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+        import kmodes.kprototypes  # noqa: F401
+    except ImportError:
+        pass
+
+# El módulo del explorador se importa aquí porque el hilo corre cuando Streamlit ya sacó
+# la carpeta del script del sys.path
+def iniciar_precalentamiento():
+    estado = estado_precalentamiento()
+    with estado['bloqueo']:
+        if (estado['lanzado'] or estado['intentos'] >= max_intentos_precalentamiento
+                or time.monotonic() < estado['proximo_intento']):
+            return
+        estado['lanzado'] = True
+        estado['intentos'] += 1
+    from explorador import construir_indices
+    threading.Thread(target=precalentar, args=(construir_indices, estado), name="precalentamiento", daemon=True).start()
 
 # Creo las categorias del Sidebar principal de navegación con las opciones definidas que vamos a mostrar
 st.sidebar.title("Secciones del Análisis")
@@ -48,17 +142,18 @@ seccion = st.sidebar.radio("Selecciona una sección:", (
     "Compensación y Salarios",
     "Análisis de Correlación",
     "Análisis Geográfico",
-    "Ofertas de Empleo"
+    "Ofertas de Empleo",
+    "Explorador de Ofertas"
 ))
 
-# Defino los filtros en el Sidebar 
+# Defino los filtros en el Sidebar a partir de los diccionarios de categorías
 st.sidebar.header("Filtros")
-company_size_options = ['Todos'] + list(df["company_size"].unique())
-education_required_options = ['Todos'] + list(df["education_required"].unique())
-industry_options = ['Todos'] + list(df["industry"].unique())
-employment_type_options = ['Todos'] + list(df["employment_type"].unique())
-experience_level_options = ['Todos'] + list(df["experience_level"].unique())
-country_options = ['Todos'] + list(df["company_location"].unique())
+company_size_options = ['Todos'] + list(size_map.values())
+education_required_options = ['Todos'] + education_levels
+industry_options = ['Todos'] + industries
+employment_type_options = ['Todos'] + list(employment_map.values())
+experience_level_options = ['Todos'] + list(experience_map.values())
+country_options = ['Todos'] + countries
 
 #Creo los selectbox para los filtros 
 company_size = st.sidebar.selectbox("Tamaño de compañía", options=company_size_options)
@@ -68,25 +163,43 @@ employment_type = st.sidebar.selectbox("Tipo de empleo", options=employment_type
 experience_level = st.sidebar.selectbox("Nivel de experiencia", options=experience_level_options)
 country = st.sidebar.selectbox("País de la empresa", options=country_options)
 
-# Aplicar filtros
-df_filtered = df.copy()
-if company_size != 'Todos':
-    df_filtered = df_filtered[df_filtered["company_size"] == company_size]
-if education_required != 'Todos':
-    df_filtered = df_filtered[df_filtered["education_required"] == education_required]
-if industry != 'Todos':
-    df_filtered = df_filtered[df_filtered["industry"] == industry]
-if employment_type != 'Todos':
-    df_filtered = df_filtered[df_filtered["employment_type"] == employment_type]
-if experience_level != 'Todos':
-    df_filtered = df_filtered[df_filtered["experience_level"] == experience_level]
-if country != 'Todos':
-    df_filtered = df_filtered[df_filtered["company_location"] == country]
+# Filtros seleccionados, forman parte de la clave de los resultados en la cache compartida
+filtros_activos = {
+    "company_size": company_size,
+    "education_required": education_required,
+    "industry": industry,
+    "employment_type": employment_type,
+    "experience_level": experience_level,
+    "company_location": country
+}
 
 st.markdown("""
 <h1 style='text-align: center;'>Dashboard - Análisis Global de Salarios para Empleos Relacionados con IA</h1>
 """, unsafe_allow_html=True)
 
+# Solo las secciones de análisis necesitan plotly y los datos, la página de Inicio es estática
+if seccion != "Inicio":
+    import plotly.express as px
+
+    #Cargo el dataframe con los datos
+    df = load_data()
+
+    # Aplicar filtros. El explorador de ofertas filtra con sus propios índices y no necesita la copia
+    if seccion != "Explorador de Ofertas":
+        df_filtered = df.copy()
+        if company_size != 'Todos':
+            df_filtered = df_filtered[df_filtered["company_size"] == company_size]
+        if education_required != 'Todos':
+            df_filtered = df_filtered[df_filtered["education_required"] == education_required]
+        if industry != 'Todos':
+            df_filtered = df_filtered[df_filtered["industry"] == industry]
+        if employment_type != 'Todos':
+            df_filtered = df_filtered[df_filtered["employment_type"] == employment_type]
+        if experience_level != 'Todos':
+            df_filtered = df_filtered[df_filtered["experience_level"] == experience_level]
+        if country != 'Todos':
+            df_filtered = df_filtered[df_filtered["company_location"] == country]
+
 # Mostrar contenido según la sección seleccionada
 if seccion == "Inicio":
     
@@ -391,61 +504,68 @@ elif seccion == "Análisis de Correlación":
     st.subheader("Clustering: KPrototypes y KMeans")
     st.markdown("### KPrototypes: Clusters con variables mixtas")
     try:
-        from kmodes.kprototypes import KPrototypes
-        features = ['salary_usd', 'years_experience', 'company_size', 'experience_level', 'education_required']
-        df_cluster = df_filtered[features].dropna().copy()
-        for col in ['company_size', 'experience_level', 'education_required']:
-            df_cluster[col] = df_cluster[col].astype(str)
-        X = df_cluster.values
-        kproto = KPrototypes(n_clusters=3, random_state=42)
-        categorical_columns = [2, 3, 4]
-        clusters = kproto.fit_predict(X, categorical=categorical_columns)
-        df_cluster['cluster'] = clusters.astype(str)
-        custom_colors = [px.colors.sequential.Viridis[1], px.colors.sequential.Viridis[6], px.colors.sequential.Viridis[9]]
-        fig_kproto = px.scatter(
-            df_cluster,
-            x='salary_usd',
-            y='years_experience',
-            color='cluster',
-            color_discrete_sequence=custom_colors,
-            title='K-Prototypes: Clusters con variables mixtas',
-            labels={
-                'salary_usd': 'Salario (USD)',
-                'years_experience': 'Años de experiencia',
-                'cluster': 'Cluster'
-            }
-        )
-        fig_kproto.update_layout(width=900, height=500, template='simple_white', title_x=0.5)
+        # El clustering se calcula una vez por combinación de filtros y se comparte entre réplicas
+        def clustering_kprototypes():
+            from kmodes.kprototypes import KPrototypes
+            features = ['salary_usd', 'years_experience', 'company_size', 'experience_level', 'education_required']
+            df_cluster = df_filtered[features].dropna().copy()
+            for col in ['company_size', 'experience_level', 'education_required']:
+                df_cluster[col] = df_cluster[col].astype(str)
+            X = df_cluster.values
+            kproto = KPrototypes(n_clusters=3, random_state=42)
+            categorical_columns = [2, 3, 4]
+            clusters = kproto.fit_predict(X, categorical=categorical_columns)
+            df_cluster['cluster'] = clusters.astype(str)
+            custom_colors = [px.colors.sequential.Viridis[1], px.colors.sequential.Viridis[6], px.colors.sequential.Viridis[9]]
+            fig_kproto = px.scatter(
+                df_cluster,
+                x='salary_usd',
+                y='years_experience',
+                color='cluster',
+                color_discrete_sequence=custom_colors,
+                title='K-Prototypes: Clusters con variables mixtas',
+                labels={
+                    'salary_usd': 'Salario (USD)',
+                    'years_experience': 'Años de experiencia',
+                    'cluster': 'Cluster'
+                }
+            )
+            fig_kproto.update_layout(width=900, height=500, template='simple_white', title_x=0.5)
+            return fig_kproto
+        fig_kproto = figura_compartida('clustering_kprototypes', clustering_kprototypes, filtros_activos)
         st.plotly_chart(fig_kproto, use_container_width=True)
     except Exception as e:
         st.warning(f"No se pudo mostrar el clustering KPrototypes: {e}")
 
     st.markdown("### KMeans: Clusters según salario y años de experiencia")
     try:
-        from sklearn.cluster import KMeans
-        from sklearn.preprocessing import StandardScaler
-        features = ['salary_usd', 'years_experience']
-        df_kmeans = df_filtered.dropna(subset=features).copy()
-        X = df_kmeans[features]
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        kmeans = KMeans(n_clusters=3, random_state=42)
-        df_kmeans['cluster'] = kmeans.fit_predict(X_scaled)
-        custom_colors = [px.colors.sequential.Viridis[1], px.colors.sequential.Viridis[6], px.colors.sequential.Viridis[9]]
-        fig_kmeans = px.scatter(
-            df_kmeans,
-            x='salary_usd',
-            y='years_experience',
-            color='cluster',
-            color_continuous_scale=custom_colors,
-            title='Clusters según salario y años de experiencia',
-            labels={
-                'salary_usd': 'Salario (USD)',
-                'years_experience': 'Años de experiencia',
-                'cluster': 'Cluster'
-            }
-        )
-        fig_kmeans.update_layout(width=800, height=400, template='simple_white', title_x=1, legend_title_text='Cluster')
+        def clustering_kmeans():
+            from sklearn.cluster import KMeans
+            from sklearn.preprocessing import StandardScaler
+            features = ['salary_usd', 'years_experience']
+            df_kmeans = df_filtered.dropna(subset=features).copy()
+            X = df_kmeans[features]
+            scaler = StandardScaler()
+            X_scaled = scaler.fit_transform(X)
+            kmeans = KMeans(n_clusters=3, random_state=42)
+            df_kmeans['cluster'] = kmeans.fit_predict(X_scaled)
+            custom_colors = [px.colors.sequential.Viridis[1], px.colors.sequential.Viridis[6], px.colors.sequential.Viridis[9]]
+            fig_kmeans = px.scatter(
+                df_kmeans,
+                x='salary_usd',
+                y='years_experience',
+                color='cluster',
+                color_continuous_scale=custom_colors,
+                title='Clusters según salario y años de experiencia',
+                labels={
+                    'salary_usd': 'Salario (USD)',
+                    'years_experience': 'Años de experiencia',
+                    'cluster': 'Cluster'
+                }
+            )
+            fig_kmeans.update_layout(width=800, height=400, template='simple_white', title_x=1, legend_title_text='Cluster')
+            return fig_kmeans
+        fig_kmeans = figura_compartida('clustering_kmeans', clustering_kmeans, filtros_activos)
         st.plotly_chart(fig_kmeans, use_container_width=True)
     except Exception as e:
         st.warning(f"No se pudo mostrar el clustering KMeans: {e}")
@@ -720,5 +840,48 @@ elif seccion == "Ofertas de Empleo":
     fig.update_layout(xaxis_tickangle=-45, showlegend=False, title_x=0.5)
     st.plotly_chart(fig, use_container_width=True)
 
+elif seccion == "Explorador de Ofertas":
+    from explorador import construir_indices, ordenar_coincidencias, pagina_keyset
+
+    st.markdown("---")
+    st.subheader("Explorador de ofertas de empleo")
+    st.markdown("Consulta las ofertas individuales que forman los agregados del dashboard. Se aplican los filtros del Sidebar y solo se carga la página visible.")
+    indices = construir_indices(df)
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    campo_busqueda = col1.selectbox("Buscar en", options=['job_title', 'company_name'], format_func={'job_title': 'Cargo', 'company_name': 'Empresa'}.get)
+    texto_busqueda = col2.text_input("Empieza por", value="")
+    campo_orden = col3.selectbox("Ordenar por", options=['salary_usd', 'posting_date'], format_func={'salary_usd': 'Salario', 'posting_date': 'Fecha de publicación'}.get)
+    ascendente = col4.selectbox("Orden", options=[False, True], format_func=lambda x: 'Ascendente' if x else 'Descendente')
+    tam_pagina = col5.selectbox("Ofertas por página", options=[25, 50, 100])
+
+    # Los filtros y la búsqueda se resuelven con los índices, sin copiar el dataframe
+    filtros = tuple((col, valor) for col, valor in filtros_activos.items() if valor != 'Todos')
+    busqueda = (campo_busqueda, texto_busqueda.strip().lower()) if texto_busqueda.strip() else None
+
+    # Guardo en la sesión la pila de cursores de las páginas visitadas; si cambia la consulta vuelvo a la primera
+    consulta = (filtros, busqueda, campo_orden, ascendente, tam_pagina)
+    if st.session_state.get('explorador_consulta') != consulta:
+        st.session_state['explorador_consulta'] = consulta
+        st.session_state['explorador_cursores'] = [None]
+    cursores = st.session_state['explorador_cursores']
+    rangos = ordenar_coincidencias(indices, filtros, busqueda, campo_orden, ascendente)
+    total = len(rangos)
+    filas, siguiente = pagina_keyset(indices['orden'][(campo_orden, ascendente)], rangos, cursores[-1], tam_pagina)
+
+    columnas = ['job_id', 'job_title', 'company_name', 'salary_usd', 'experience_level', 'employment_type', 'company_location', 'industry', 'posting_date']
+    st.dataframe(df.iloc[filas][columnas], use_container_width=True, hide_index=True)
+
+    total_paginas = max(1, -(-total // tam_pagina))
+    col1, col2, col3 = st.columns([1, 3, 1])
+    col1.button("Anterior", on_click=cursores.pop, disabled=len(cursores) == 1)
+    col2.markdown(f"<p style='text-align: center;'>Página {len(cursores)} de {total_paginas} · {total:,} ofertas</p>", unsafe_allow_html=True)
+    col3.button("Siguiente", on_click=cursores.append, args=(siguiente,), disabled=siguiente is None)
+
 st.markdown("---")
 
+
+# Reporto el tiempo hasta el primer render y, ya con la página dibujada, lanzo el precalentamiento
+tiempo_render_ms = (time.perf_counter() - inicio_render) * 1000
+st.sidebar.caption(f"Tiempo de render: {tiempo_render_ms:,.0f} ms")
+iniciar_precalentamiento()
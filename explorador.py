@@ -0,0 +1,109 @@
+# Índices y paginación del explorador de ofertas.
+# Los índices se construyen una sola vez por proceso y permiten filtrar, ordenar y
+# buscar sin copiar el dataframe completo: a Streamlit solo se envía la página visible.
+from bisect import bisect_left
+
+import numpy as np
+import streamlit as st
+
+# Columnas que tienen filtro en el Sidebar, por las que se puede ordenar y en las que se puede buscar
+columnas_filtro = ['company_size', 'education_required', 'industry', 'employment_type', 'experience_level', 'company_location']
+columnas_orden = ['salary_usd', 'posting_date']
+columnas_busqueda = ['job_title', 'company_name']
+
+
+def claves_numericas(serie):
+    # Paso la columna a float64 con NaN para los vacíos, así fechas y salarios se ordenan igual
+    if np.issubdtype(serie.dtype, np.datetime64):
+        valores = serie.to_numpy(dtype='datetime64[ns]').view('int64').astype('float64')
+    else:
+        valores = serie.to_numpy(dtype='float64', na_value=np.nan).copy()
+    valores[serie.isna().to_numpy()] = np.nan
+    return valores
+
+
+def indice_prefijos(serie):
+    # Diccionario ordenado de términos: el valor completo y cada palabra, en minúsculas.
+    # Cada término apunta a los valores que lo contienen y cada valor a sus filas.
+    texto = serie.astype(str)
+    posiciones = texto.groupby(texto.to_numpy(), sort=False).indices
+    terminos = {}
+    for valor in posiciones:
+        minusculas = valor.lower()
+        for termino in {minusculas, *minusculas.split()}:
+            terminos.setdefault(termino, []).append(valor)
+    claves = sorted(terminos)
+    return {'claves': claves, 'valores': [terminos[c] for c in claves], 'posiciones': posiciones}
+
+
+def buscar_prefijo(indice, prefijo):
+    # Todas las filas con algún término que empieza por el prefijo, usando búsqueda binaria
+    prefijo = prefijo.strip().lower()
+    inicio = bisect_left(indice['claves'], prefijo)
+    fin = bisect_left(indice['claves'], prefijo + '\U0010ffff')
+    valores = {valor for grupo in indice['valores'][inicio:fin] for valor in grupo}
+    if not valores:
+        return np.array([], dtype=np.intp)
+    return np.concatenate([indice['posiciones'][valor] for valor in valores])
+
+
+def permutacion_orden(valores, ascendente):
+    # Permutación preordenada de las filas. Para el orden descendente niego las claves, así
+    # los NaN quedan al final en ambos sentidos. El orden estable deja los empates por
+    # posición de fila, con lo que la permutación es un orden total de las filas.
+    claves = valores if ascendente else -valores
+    return np.argsort(claves, kind='stable')
+
+
+# Sin spinner porque también la llama el hilo de precalentamiento, que no tiene sesión
+@st.cache_resource(show_spinner=False)
+def construir_indices(_df):
+    indices = {'n': len(_df), 'filtros': {}, 'orden': {}, 'busqueda': {}}
+    for col in columnas_filtro:
+        indices['filtros'][col] = _df.groupby(col, observed=True, sort=False).indices
+    for col in columnas_orden:
+        valores = claves_numericas(_df[col])
+        for ascendente in (True, False):
+            indices['orden'][(col, ascendente)] = permutacion_orden(valores, ascendente)
+    for col in columnas_busqueda:
+        indices['busqueda'][col] = indice_prefijos(_df[col])
+    return indices
+
+
+def construir_mascara(indices, filtros, busqueda):
+    # filtros: tupla de (columna, valor); busqueda: (columna, prefijo) o None
+    n = indices['n']
+    mascara = np.ones(n, dtype=bool)
+    for col, valor in filtros:
+        seleccion = np.zeros(n, dtype=bool)
+        seleccion[indices['filtros'][col].get(valor, np.array([], dtype=np.intp))] = True
+        mascara &= seleccion
+    if busqueda is not None:
+        col, prefijo = busqueda
+        seleccion = np.zeros(n, dtype=bool)
+        seleccion[buscar_prefijo(indices['busqueda'][col], prefijo)] = True
+        mascara &= seleccion
+    return mascara
+
+
+# Solo guardo un arreglo por consulta, y pocas consultas por un tiempo limitado, porque con
+# millones de filas cada entrada ocupa varios MB y la cache es compartida por todo el proceso
+@st.cache_resource(max_entries=8, ttl=600, show_spinner=False)
+def ordenar_coincidencias(_indices, filtros, busqueda, columna, ascendente):
+    # Posiciones dentro de la permutación preordenada de las filas que cumplen filtros y
+    # búsqueda. Quedan crecientes, así cada página es una búsqueda binaria y un corte.
+    permutacion = _indices['orden'][(columna, ascendente)]
+    mascara = construir_mascara(_indices, filtros, busqueda)
+    return np.flatnonzero(mascara[permutacion])
+
+
+def pagina_keyset(permutacion, rangos, cursor, tam_pagina):
+    # Devuelve las filas de la página que empieza después del cursor y el cursor de la página
+    # siguiente (None si es la última). El cursor es la posición en la permutación de la
+    # última fila mostrada: identifica de forma única su (clave, fila) en el orden total.
+    inicio = 0 if cursor is None else int(np.searchsorted(rangos, cursor, side='right'))
+    pagina = rangos[inicio:inicio + tam_pagina]
+    siguiente = None
+    if inicio + tam_pagina < len(rangos):
+        siguiente = int(pagina[-1])
+    return permutacion[pagina], siguiente
@@ -0,0 +1,265 @@
+# Pruebas de la cache compartida. El backend Redis se prueba contra un servidor local
+# mínimo que habla RESP, así no hace falta tener Redis instalado.
+import pickle
+import socketserver
+import threading
+import time
+
+import pytest
+
+from cache_compartido import (BackendRedis, BackendSQLite, CacheResultados, ErrorRedis, clave_contenido,
+                              script_borrar_si_igual)
+
+
+class ServidorRESP(socketserver.ThreadingTCPServer):
+    # Implementa AUTH, GET, SET [NX] [PX], DEL y el EVAL de comparar y borrar que usa BackendRedis
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), ManejadorRESP)
+        self.datos = {}
+        self.bloqueo = threading.Lock()
+        # Si es True, el próximo SET NX se guarda pero se corta la conexión sin responder
+        self.perder_respuesta_set_nx = False
+        # Si tiene valor, las conexiones deben autenticarse con AUTH antes de cualquier comando
+        self.contrasena = None
+
+    def vigente(self, clave):
+        valor, expira = self.datos.get(clave, (None, None))
+        if expira is not None and expira <= time.time():
+            del self.datos[clave]
+            return None
+        return valor
+
+
+class ManejadorRESP(socketserver.StreamRequestHandler):
+
+    def leer_comando(self):
+        linea = self.rfile.readline()
+        if not linea:
+            return None
+        argumentos = []
+        for _ in range(int(linea[1:-2])):
+            largo = int(self.rfile.readline()[1:-2])
+            argumentos.append(self.rfile.read(largo + 2)[:-2])
+        return argumentos
+
+    def handle(self):
+        servidor = self.server
+        autenticado = False
+        while True:
+            argumentos = self.leer_comando()
+            if argumentos is None:
+                return
+            comando, clave = argumentos[0].upper(), argumentos[1]
+            with servidor.bloqueo:
+                if comando == b'AUTH':
+                    autenticado = servidor.contrasena is not None and clave.decode() == servidor.contrasena
+                    respuesta = b'+OK\r\n' if autenticado else b'-WRONGPASS contrasena invalida\r\n'
+                elif servidor.contrasena is not None and not autenticado:
+                    respuesta = b'-NOAUTH se requiere autenticacion\r\n'
+                elif comando == b'GET':
+                    valor = servidor.vigente(clave)
+                    respuesta = b'$-1\r\n' if valor is None else b'$%d\r\n%s\r\n' % (len(valor), valor)
+                elif comando == b'SET':
+                    opciones = [a.upper() for a in argumentos[3:]]
+                    expira = None
+                    if b'PX' in opciones:
+                        expira = time.time() + int(argumentos[3 + opciones.index(b'PX') + 1]) / 1000
+                    if b'NX' in opciones and servidor.vigente(clave) is not None:
+                        respuesta = b'$-1\r\n'
+                    else:
+                        servidor.datos[clave] = (argumentos[2], expira)
+                        respuesta = b'+OK\r\n'
+                        if b'NX' in opciones and servidor.perder_respuesta_set_nx:
+                            servidor.perder_respuesta_set_nx = False
+                            return
+                elif comando == b'DEL':
+                    respuesta = b':%d\r\n' % (servidor.datos.pop(clave, None) is not None)
+                elif comando == b'EVAL' and clave.decode() == script_borrar_si_igual:
+                    clave, valor = argumentos[3], argumentos[4]
+                    borrado = servidor.vigente(clave) == valor
+                    if borrado:
+                        del servidor.datos[clave]
+                    respuesta = b':%d\r\n' % borrado
+                else:
+                    respuesta = b'-ERR comando no soportado\r\n'
+            self.wfile.write(respuesta)
+
+
+@pytest.fixture
+def servidor_resp():
+    servidor = ServidorRESP()
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return BackendSQLite(str(tmp_path / 'cache.sqlite'))
+    servidor = request.getfixturevalue('servidor_resp')
+    return BackendRedis(f'redis://127.0.0.1:{servidor.server_address[1]}/0')
+
+
+def test_backend_get_set_delete(backend):
+    assert backend.get('k') is None
+    backend.set('k', b'valor', 60)
+    assert backend.get('k') == b'valor'
+    backend.delete('k')
+    assert backend.get('k') is None
+
+
+def test_backend_ttl(backend):
+    backend.set('k', b'valor', 0.1)
+    assert backend.get('k') == b'valor'
+    time.sleep(0.2)
+    assert backend.get('k') is None
+
+
+def test_backend_add_solo_si_no_existe(backend):
+    assert backend.add('k', b'primero', 60)
+    assert not backend.add('k', b'segundo', 60)
+    assert backend.get('k') == b'primero'
+    backend.set('vence', b'viejo', 0.1)
+    time.sleep(0.2)
+    assert backend.add('vence', b'nuevo', 60)
+
+
+def test_backend_delete_if_equals(backend):
+    backend.set('k', b'ajeno', 60)
+    backend.delete_if_equals('k', b'mio')
+    assert backend.get('k') == b'ajeno'
+    backend.delete_if_equals('k', b'ajeno')
+    assert backend.get('k') is None
+
+
+def test_sqlite_desaloja_las_menos_usadas(tmp_path):
+    backend = BackendSQLite(str(tmp_path / 'cache.sqlite'), max_bytes=250)
+    backend.intervalo_uso = 0
+    backend.set('a', b'x' * 100, 60)
+    time.sleep(0.01)
+    backend.set('b', b'x' * 100, 60)
+    time.sleep(0.01)
+    backend.get('a')
+    time.sleep(0.01)
+    backend.set('c', b'x' * 100, 60)
+    assert backend.get('a') is not None
+    assert backend.get('b') is None
+    assert backend.get('c') is not None
+
+
+def test_sqlite_lectura_reciente_no_escribe(tmp_path):
+    backend = BackendSQLite(str(tmp_path / 'cache.sqlite'))
+    backend.set('k', b'valor', 60)
+    con = backend._conexion()
+    usado = con.execute("SELECT usado FROM entradas WHERE clave = 'k'").fetchone()[0]
+    cambios = con.total_changes
+    assert backend.get('k') == b'valor'
+    assert con.total_changes == cambios
+    assert con.execute("SELECT usado FROM entradas WHERE clave = 'k'").fetchone()[0] == usado
+
+
+def test_redis_auth_fallido_descarta_la_conexion(servidor_resp):
+    servidor_resp.contrasena = 'secreta'
+    puerto = servidor_resp.server_address[1]
+    backend = BackendRedis(f'redis://:equivocada@127.0.0.1:{puerto}/0')
+    with pytest.raises(ErrorRedis):
+        backend.get('k')
+    assert backend._local.sock is None
+    with pytest.raises(ErrorRedis):
+        backend.get('k')
+    backend = BackendRedis(f'redis://:secreta@127.0.0.1:{puerto}/0')
+    backend.set('k', b'valor', 60)
+    assert backend.get('k') == b'valor'
+
+
+def test_redis_add_con_respuesta_perdida(servidor_resp):
+    backend = BackendRedis(f'redis://127.0.0.1:{servidor_resp.server_address[1]}/0')
+    servidor_resp.perder_respuesta_set_nx = True
+    assert backend.add('bloqueo', b'token', 60)
+    assert not backend.add('bloqueo', b'otro', 60)
+
+
+def test_clave_contenido():
+    clave = clave_contenido('datos', 'codigo', 'f', filtros={'a': 1, 'b': 2})
+    assert clave == clave_contenido('datos', 'codigo', 'f', filtros={'b': 2, 'a': 1})
+    assert clave != clave_contenido('datos', 'otro codigo', 'f', filtros={'a': 1, 'b': 2})
+    assert clave != clave_contenido('otros datos', 'codigo', 'f', filtros={'a': 1, 'b': 2})
+
+
+def test_obtener_fallo_y_acierto(backend):
+    cache = CacheResultados(backend)
+    llamadas = []
+    calcular = lambda: llamadas.append(1) or {'total': 42}
+    assert cache.obtener('k', calcular) == {'total': 42}
+    assert cache.obtener('k', calcular) == {'total': 42}
+    assert len(llamadas) == 1
+    assert backend.get('k:bloqueo') is None
+
+
+def test_obtener_entrada_corrupta_se_recalcula(backend):
+    backend.set('k', b'no es un pickle', 60)
+    cache = CacheResultados(backend)
+    assert cache.obtener('k', lambda: 'nuevo') == 'nuevo'
+    assert pickle.loads(backend.get('k')) == 'nuevo'
+
+
+def test_obtener_espera_a_quien_tiene_el_bloqueo(backend):
+    backend.add('k:bloqueo', b'otra replica', 60)
+    cache = CacheResultados(backend, intervalo_espera=0.01)
+    threading.Timer(0.1, lambda: backend.set('k', pickle.dumps('de la otra replica'), 60)).start()
+    assert cache.obtener('k', lambda: pytest.fail("no debía calcular")) == 'de la otra replica'
+
+
+def test_obtener_calcula_si_se_pierde_el_bloqueo(backend):
+    # La otra réplica falló y soltó el bloqueo sin guardar el resultado
+    backend.add('k:bloqueo', b'otra replica', 60)
+    cache = CacheResultados(backend, intervalo_espera=0.01)
+    threading.Timer(0.1, lambda: backend.delete('k:bloqueo')).start()
+    assert cache.obtener('k', lambda: 'calculado') == 'calculado'
+
+
+def test_obtener_no_borra_un_bloqueo_ajeno(backend):
+    cache = CacheResultados(backend)
+
+    def calcular():
+        # El bloqueo venció durante el cálculo y otra réplica lo tomó
+        backend.set('k:bloqueo', b'otra replica', 60)
+        return 'calculado'
+
+    assert cache.obtener('k', calcular) == 'calculado'
+    assert backend.get('k:bloqueo') == b'otra replica'
+
+
+def test_obtener_claves_distintas_no_se_bloquean(backend):
+    cache = CacheResultados(backend)
+    empezo, terminar = threading.Event(), threading.Event()
+
+    def lento():
+        empezo.set()
+        terminar.wait(5)
+        return 'lento'
+
+    hilo = threading.Thread(target=cache.obtener, args=('lenta', lento))
+    hilo.start()
+    empezo.wait(5)
+    inicio = time.monotonic()
+    assert cache.obtener('rapida', lambda: 'rapido') == 'rapido'
+    assert time.monotonic() - inicio < 1
+    terminar.set()
+    hilo.join()
+    assert cache._bloqueos == {}
+
+
+def test_obtener_con_backend_caido():
+    cache = CacheResultados(BackendRedis('redis://127.0.0.1:1/0', timeout=0.5))
+    assert cache.obtener('k', lambda: 'calculado') == 'calculado'
+
+
+def test_obtener_sin_backend():
+    assert CacheResultados(None).obtener('k', lambda: 'calculado') == 'calculado'
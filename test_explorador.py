@@ -0,0 +1,109 @@
+# Pruebas de los índices y la paginación del explorador de ofertas
+import numpy as np
+import pandas as pd
+import pytest
+
+from explorador import (buscar_prefijo, claves_numericas, construir_indices, indice_prefijos,
+                        ordenar_coincidencias, pagina_keyset, permutacion_orden)
+
+
+@pytest.fixture
+def df():
+    # Salarios con muchos empates y vacíos, y fechas con un vacío
+    return pd.DataFrame({
+        'job_title': ['AI Software Engineer', 'Data Scientist', 'ML Engineer', 'AI Architect', 'Data Engineer', 'Research Scientist'] * 5,
+        'company_name': ['TechCorp Inc', 'Future Systems', 'Cloud AI Solutions', 'TechCorp Inc', 'Smart Analytics', 'Future Systems'] * 5,
+        'salary_usd': [100.0, 200.0, np.nan, 100.0, 300.0] * 6,
+        'posting_date': pd.to_datetime(['2024-01-01', None, '2024-03-01', '2024-01-01', '2024-02-01', '2024-01-01'] * 5),
+        'company_size': ['Small', 'Medium', 'Large'] * 10,
+        'education_required': ['Bachelor', 'Master'] * 15,
+        'industry': ['Finance'] * 30,
+        'employment_type': ['Full-time'] * 30,
+        'experience_level': ['Junior', 'Expert', 'Director'] * 10,
+        'company_location': ['Canada', 'Japan'] * 15,
+    })
+
+
+@pytest.fixture
+def indices(df):
+    # Las funciones con cache no hashean el dataframe, así que limpio entre pruebas
+    construir_indices.clear()
+    ordenar_coincidencias.clear()
+    return construir_indices(df)
+
+
+def recorrer_paginas(indices, filtros, busqueda, columna, ascendente, tam_pagina):
+    permutacion = indices['orden'][(columna, ascendente)]
+    rangos = ordenar_coincidencias(indices, filtros, busqueda, columna, ascendente)
+    filas, cursor = [], None
+    while True:
+        pagina, cursor = pagina_keyset(permutacion, rangos, cursor, tam_pagina)
+        assert len(pagina) <= tam_pagina
+        filas.extend(pagina.tolist())
+        if cursor is None:
+            return filas
+
+
+def orden_esperado(df, columna, ascendente, filas=None):
+    # Orden de referencia con pandas: por clave, vacíos al final, empates por posición de fila
+    sub = df.reset_index(drop=True)
+    if filas is not None:
+        sub = sub.iloc[sorted(filas)]
+    return sub.sort_values(columna, ascending=ascendente, na_position='last', kind='stable').index.tolist()
+
+
+@pytest.mark.parametrize('columna', ['salary_usd', 'posting_date'])
+@pytest.mark.parametrize('ascendente', [True, False])
+@pytest.mark.parametrize('tam_pagina', [1, 4, 6, 30, 50])
+def test_recorrer_todas_las_paginas(df, indices, columna, ascendente, tam_pagina):
+    filas = recorrer_paginas(indices, (), None, columna, ascendente, tam_pagina)
+    assert filas == orden_esperado(df, columna, ascendente)
+
+
+@pytest.mark.parametrize('ascendente', [True, False])
+def test_vacios_al_final_en_ambos_sentidos(df, indices, ascendente):
+    filas = recorrer_paginas(indices, (), None, 'salary_usd', ascendente, 7)
+    vacios = df['salary_usd'].isna().to_numpy()[filas]
+    assert vacios[-vacios.sum():].all() and not vacios[:-vacios.sum()].any()
+
+
+def test_recorrer_con_filtros_y_busqueda(df, indices):
+    filtros = (('company_size', 'Small'),)
+    busqueda = ('job_title', 'engin')
+    filas = recorrer_paginas(indices, filtros, busqueda, 'salary_usd', False, 3)
+    coinciden = df.index[(df['company_size'] == 'Small') & df['job_title'].str.contains('Engineer')].tolist()
+    assert filas == orden_esperado(df, 'salary_usd', False, coinciden)
+
+
+def test_sin_coincidencias(indices):
+    permutacion = indices['orden'][('salary_usd', True)]
+    rangos = ordenar_coincidencias(indices, (), ('job_title', 'zzz'), 'salary_usd', True)
+    pagina, siguiente = pagina_keyset(permutacion, rangos, None, 10)
+    assert len(pagina) == 0 and siguiente is None
+
+
+def test_ultima_pagina_sin_siguiente():
+    permutacion = permutacion_orden(np.arange(10, dtype='float64'), True)
+    rangos = np.arange(10)
+    _, siguiente = pagina_keyset(permutacion, rangos, None, 5)
+    pagina, siguiente = pagina_keyset(permutacion, rangos, siguiente, 5)
+    assert pagina.tolist() == [5, 6, 7, 8, 9] and siguiente is None
+
+
+def test_claves_numericas_fechas_con_vacios():
+    valores = claves_numericas(pd.Series(pd.to_datetime(['2024-01-02', None, '2024-01-01'])))
+    assert np.isnan(valores[1]) and valores[2] < valores[0]
+
+
+def test_prefijo_valor_completo_y_palabras():
+    serie = pd.Series(['AI Software Engineer', 'AI Architect', 'Data Engineer', 'Software Tester'])
+    indice = indice_prefijos(serie)
+
+    def buscar(prefijo):
+        return sorted(buscar_prefijo(indice, prefijo).tolist())
+
+    assert buscar('ai soft') == [0]
+    assert buscar('AI') == [0, 1]
+    assert buscar('engin') == [0, 2]
+    assert buscar('  software ') == [0, 3]
+    assert buscar('ingeniero') == []